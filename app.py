@@ -1,14 +1,30 @@
 # file: api/main.py
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from datetime import datetime, timezone
 import pytz
 import pandas as pd
 from src.gold_crawler import *  # Các class API crawl
-from fastapi.responses import JSONResponse
+from src.snapshot_store import PriceSnapshot, SnapshotStore
+from src.price_stream import PriceBroadcaster, initial_snapshot
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi import FastAPI, Query
 import json
 
-app = FastAPI(title="Gold Price Crawler API")
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Khởi động vòng crawl nền cho stream giá, hủy khi tắt server.
+    """
+    broadcaster.bind(asyncio.get_running_loop())
+    app.state.stream_task = asyncio.create_task(stream_crawl_loop())
+    yield
+    app.state.stream_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await app.state.stream_task
+
+app = FastAPI(title="Gold Price Crawler API", lifespan=lifespan)
 
 # Map giữa .env key và class API
 apis = {
@@ -20,6 +36,19 @@ apis = {
     "WORLD_GOLD_PRICE": WORLD_GOLD_PRICE_API
 }
 
+# Snapshot thành công gần nhất của từng source, dùng khi vendor lỗi / circuit breaker mở
+last_good = {}
+
+# Lịch sử giá dạng gọn (int64 + key đã intern) để phục vụ nhanh không cần crawl lại
+snapshot_store = SnapshotStore()
+
+# Đẩy các dòng giá thay đổi tới client đang stream (/prices/ws, /prices/stream)
+broadcaster = PriceBroadcaster()
+
+# Chu kỳ crawl nền khi có client stream (giây) và chu kỳ gửi heartbeat
+STREAM_CRAWL_INTERVAL = float(os.getenv("STREAM_CRAWL_INTERVAL", 60))
+STREAM_HEARTBEAT = 15
+
 
 def crawl_all_sources() -> dict:
     """
@@ -37,18 +66,49 @@ def crawl_all_sources() -> dict:
             df.columns = [col.lower() for col in df.columns]
 
             # Thêm metadata
+            crawl_time = datetime.now()
             df["source"] = env_key.lower()
-            df["crawl_time"] = datetime.now().isoformat()
+            df["crawl_time"] = crawl_time.isoformat()
 
             result[env_key] = df
+            last_good[env_key] = df
+
+            try:
+                snapshot = PriceSnapshot.from_dataframe(env_key.lower(), df, crawl_time.timestamp())
+                broadcaster.publish(snapshot, snapshot_store.add(snapshot))
+            except Exception as e:
+                print(f"⚠️ Không lưu được snapshot {env_key}: {str(e)}")
 
         except Exception as e:
             print(f"❌ Lỗi crawl {env_key}: {str(e)}")
-            result[env_key] = None  # Lưu None để biết đã fail
+            if env_key in last_good:
+                # Trả về snapshot cũ, crawl_time giữ nguyên để client biết dữ liệu đã cũ
+                stale_df = last_good[env_key].copy()
+                stale_df.attrs["stale"] = True
+                stale_df.attrs["error"] = str(e)
+                result[env_key] = stale_df
+            else:
+                result[env_key] = None  # Lưu None để biết đã fail
             continue
 
     return result
 
+async def stream_crawl_loop():
+    """
+    Crawl định kỳ trong thread riêng, chỉ chạy khi có client đang stream.
+    Client đầu tiên kết nối sẽ đánh thức vòng lặp để crawl ngay.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        broadcaster.wakeup.clear()
+        if broadcaster.has_subscribers():
+            try:
+                await loop.run_in_executor(None, crawl_all_sources)
+            except Exception as e:
+                print(f"❌ Lỗi crawl nền: {str(e)}")
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(broadcaster.wakeup.wait(), STREAM_CRAWL_INTERVAL)
+
 @app.get("/crawl-all-daily")
 def crawl_all():
     """
@@ -75,10 +135,12 @@ def crawl_all():
 
 
             output[env_key] = {
-                "status": "success",
+                "status": "stale" if df.attrs.get("stale") else "success",
                 "row_count": len(df_safe),
                 "data": df_safe.to_dict(orient="records"),
             }
+            if df.attrs.get("stale"):
+                output[env_key]["message"] = df.attrs.get("error")
         elif df is None:
             output[env_key] = {"status": "error", "message": "Exception during crawl"}
         else:
@@ -86,6 +148,98 @@ def crawl_all():
 
     return output
 
+@app.get("/prices/latest")
+def get_latest_prices(source: str = None, key: str = None):
+    """
+    Trả về giá mới nhất từ snapshot_store (không crawl lại).
+    """
+    if source and key:
+        record = snapshot_store.get(source, key)
+        if record is None:
+            return JSONResponse(status_code=404, content={"error": f"Không có dữ liệu cho {source}/{key}"})
+        return record.to_dict()
+
+    output = {}
+    for name in ([source] if source else snapshot_store.sources()):
+        snapshot = snapshot_store.latest(name)
+        if snapshot is None:
+            output[name] = {"status": "empty", "message": "Chưa có snapshot"}
+            continue
+        output[name] = {
+            "status": "success",
+            "row_count": len(snapshot),
+            "data": snapshot.to_dict(),
+        }
+    return output
+
+@app.get("/prices/diff")
+def get_price_diff(source: str):
+    """
+    So sánh 2 snapshot gần nhất của 1 nguồn.
+    """
+    snapshots = snapshot_store.snapshots(source)
+    if not snapshots:
+        return JSONResponse(status_code=404, content={"error": f"Chưa có snapshot cho {source}"})
+
+    latest = snapshots[-1]
+    previous = snapshots[-2] if len(snapshots) > 1 else None
+    diff = latest.diff(previous)
+    return {
+        "source": source,
+        "crawl_time": datetime.fromtimestamp(latest.crawl_ts).isoformat(),
+        "added": [latest.get(k).to_dict() for k in diff["added"]],
+        "removed": diff["removed"],
+        "changed": [latest.get(k).to_dict() for k in diff["changed"]],
+    }
+
+@app.websocket("/prices/ws")
+async def price_websocket(websocket: WebSocket, sources: list[str] = Query(None),
+                          keys: list[str] = Query(None)):
+    """
+    Stream giá qua WebSocket: gửi snapshot ban đầu, sau đó chỉ gửi các dòng thay đổi.
+    Filter lặp lại tham số, ví dụ ?sources=sjc_daily&keys=Vàng SJC 1L, 10L, 1KG | Hồ Chí Minh
+    (key sản phẩm có thể chứa dấu phẩy nên không tách theo ",").
+    """
+    await websocket.accept()
+    subscriber = broadcaster.subscribe(sources, keys)
+    try:
+        await websocket.send_json({"type": "snapshot", "rows": initial_snapshot(snapshot_store, subscriber)})
+        while True:
+            rows = await subscriber.next_batch(STREAM_HEARTBEAT)
+            if rows:
+                await websocket.send_json({"type": "update", "rows": rows, "dropped": subscriber.dropped})
+            else:
+                await websocket.send_json({"type": "ping"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        broadcaster.unsubscribe(subscriber)
+
+@app.get("/prices/stream")
+async def price_sse(request: Request, sources: list[str] = Query(None),
+                    keys: list[str] = Query(None)):
+    """
+    Stream giá qua Server-Sent Events, cùng định dạng với /prices/ws.
+    """
+    async def event_stream():
+        # Subscribe bên trong generator để finally luôn unsubscribe được
+        subscriber = broadcaster.subscribe(sources, keys)
+        try:
+            rows = initial_snapshot(snapshot_store, subscriber)
+            yield f"event: snapshot\ndata: {json.dumps(rows, ensure_ascii=False)}\n\n"
+            while not await request.is_disconnected():
+                rows = await subscriber.next_batch(STREAM_HEARTBEAT)
+                if rows:
+                    data = json.dumps({"rows": rows, "dropped": subscriber.dropped}, ensure_ascii=False)
+                    yield f"event: update\ndata: {data}\n\n"
+                else:
+                    yield ": ping\n\n"
+        finally:
+            broadcaster.unsubscribe(subscriber)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.get("/crawl-pnj-history")
 def crawl_pnj_history(day: str,
                       month: str,
@@ -1,4 +1,5 @@
 import os
+import time
 import requests
 import pandas as pd
 import re
@@ -8,6 +9,8 @@ from bs4 import BeautifulSoup
 import xml.etree.ElementTree as ET
 from datetime import datetime, timezone
 import pytz
+from src.resilience import (CircuitOpenError, RateLimitError, RETRY_STATUSES, get_policy,
+                            retry_after_seconds)
 
 # Load biến môi trường từ .env
 load_dotenv("./src/.env")
@@ -29,20 +32,84 @@ class GoldPriceAPI(ABC):
             raise ValueError(f"Không tìm thấy API '{api_name}' trong file .env")
 
     def fetch_data(self, payload=None):
-        """Gửi request và trả về JSON nếu thành công"""
+        """Gửi request và trả về response nếu thành công.
+
+        Mỗi host có rate limit, timeout, retry (exponential backoff + jitter)
+        và circuit breaker riêng, cấu hình trong src/resilience.py.
+        """
         # payload = {
         #     "method": "GetSJCGoldPriceByDate",
         #     "toDate": date,  # Định dạng dd/mm/yyyy
         # }
-        if not payload:
-            response = requests.get(self.api_url, headers=self.headers)
-        else:
-            response = requests.get(self.api_url, headers=self.headers, payload=payload)
-
-        if response.status_code == 200:
-            return response
-        else:
-            raise Exception(f"Lỗi khi gọi API: {response.status_code}")
+        policy = get_policy(self.api_url)
+        if not policy.breaker.allow():
+            raise CircuitOpenError(policy.host, policy.breaker.retry_after())
+
+        # Tổng thời gian cho cả lần gọi (mọi lần retry + chờ rate limit + đọc body)
+        deadline = time.monotonic() + policy.deadline
+        error = None
+        delay = 0
+        try:
+            for attempt in range(policy.max_retries + 1):
+                if attempt:
+                    delay = max(delay, policy.backoff(attempt - 1))
+                    if time.monotonic() + delay >= deadline:
+                        break
+                    time.sleep(delay)
+                    delay = 0
+
+                max_wait = min(policy.backoff_max, deadline - time.monotonic())
+                if max_wait < 0 or not policy.bucket.acquire(max_wait=max_wait):
+                    if error is None:
+                        # Chưa gọi tới vendor lần nào: tự mình throttle, không tính là vendor lỗi
+                        policy.breaker.release()
+                        raise RateLimitError(policy.host)
+                    break
+
+                remaining = deadline - time.monotonic()
+                timeout = tuple(min(t, remaining) for t in policy.timeout)
+                try:
+                    response = requests.get(self.api_url, headers=self.headers, params=payload,
+                                            timeout=timeout, stream=True)
+                    if response.status_code == 200:
+                        self._read_body(response, deadline)
+                except requests.RequestException as e:
+                    error = e
+                    continue
+
+                if response.status_code == 200:
+                    policy.breaker.record_success()
+                    return response
+
+                response.close()
+                error = Exception(f"Lỗi khi gọi API: {response.status_code}")
+                if response.status_code not in RETRY_STATUSES:
+                    break
+                if response.status_code in (429, 503):
+                    # Vendor báo quá tải: chờ đúng Retry-After (nếu có) trước lần gọi sau
+                    delay = retry_after_seconds(response.headers.get("Retry-After"))
+                    policy.bucket.penalize(delay)
+        except RateLimitError:
+            raise
+        except Exception:
+            # Mọi lỗi bất ngờ đều phải ghi nhận, nếu không breaker có thể kẹt ở half_open
+            policy.breaker.record_failure()
+            raise
+
+        policy.breaker.record_failure()
+        raise error or requests.Timeout(f"Hết thời gian {policy.deadline}s khi gọi '{policy.host}'")
+
+    @staticmethod
+    def _read_body(response, deadline):
+        """Đọc body theo từng chunk, ngắt nếu vendor trả dữ liệu nhỏ giọt quá deadline"""
+        chunks = []
+        for chunk in response.iter_content(chunk_size=65536):
+            chunks.append(chunk)
+            if time.monotonic() > deadline:
+                response.close()
+                raise requests.Timeout("Đọc response quá deadline")
+        response._content = b"".join(chunks)
+        response._content_consumed = True
 
     @abstractmethod
     def transform(self, json_data):
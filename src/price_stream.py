@@ -0,0 +1,103 @@
+import asyncio
+import threading
+
+
+class Subscriber:
+    """Một client đang stream giá (WebSocket hoặc SSE).
+
+    Backpressure: thay vì xếp hàng vô hạn, các thay đổi chưa gửi được gộp theo
+    (source, key) và chỉ giữ bản mới nhất. Client chậm sẽ nhận trạng thái mới
+    nhất của từng sản phẩm, bộ nhớ bị chặn bởi số sản phẩm chứ không phải số lần crawl.
+    """
+
+    def __init__(self, sources=None, keys=None):
+        self.sources = set(sources) if sources else None
+        self.keys = set(keys) if keys else None
+        self.pending = {}
+        self.dropped = 0  # số thay đổi bị gộp vì client chưa kịp nhận
+        self.event = asyncio.Event()
+
+    def match(self, source, key):
+        return (self.sources is None or source in self.sources) and \
+               (self.keys is None or key in self.keys)
+
+    def push(self, rows):
+        """Chạy trong event loop: nhận các dòng thay đổi và đánh thức consumer"""
+        for row in rows:
+            if not self.match(row["source"], row["key"]):
+                continue
+            slot = (row["source"], row["key"])
+            if slot in self.pending:
+                self.dropped += 1
+            self.pending[slot] = row
+        if self.pending:
+            self.event.set()
+
+    async def next_batch(self, timeout):
+        """Chờ thay đổi tối đa timeout giây, trả về list dòng (rỗng nếu hết giờ)"""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self.event.clear()
+        rows, self.pending = list(self.pending.values()), {}
+        return rows
+
+
+class PriceBroadcaster:
+    """Phát các thay đổi giá từ crawler (chạy trong thread) tới các subscriber (async)"""
+
+    def __init__(self):
+        self.subscribers = set()
+        self.loop = None
+        self.wakeup = None  # set khi có subscriber đầu tiên để crawl ngay, không chờ hết chu kỳ
+        self.lock = threading.Lock()
+
+    def bind(self, loop):
+        self.loop = loop
+        self.wakeup = asyncio.Event()
+
+    def subscribe(self, sources=None, keys=None):
+        subscriber = Subscriber(sources, keys)
+        with self.lock:
+            first = not self.subscribers
+            self.subscribers.add(subscriber)
+        if first and self.wakeup is not None:
+            self.wakeup.set()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def has_subscribers(self):
+        return bool(self.subscribers)
+
+    def publish(self, snapshot, diff):
+        """Gọi từ crawl_all_sources sau khi snapshot_store.add() trả về diff"""
+        if self.loop is None or not self.subscribers:
+            return
+
+        rows = [dict(snapshot.get(k).to_dict(), type="added") for k in diff["added"]]
+        rows += [dict(snapshot.get(k).to_dict(), type="changed") for k in diff["changed"]]
+        rows += [{"source": snapshot.source, "key": k, "type": "removed"} for k in diff["removed"]]
+        if not rows:
+            return
+
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            self.loop.call_soon_threadsafe(subscriber.push, rows)
+
+
+def initial_snapshot(store, subscriber):
+    """Các dòng giá mới nhất trong store khớp với filter của subscriber"""
+    rows = []
+    for source in store.sources():
+        if subscriber.sources is not None and source not in subscriber.sources:
+            continue
+        snapshot = store.latest(source)
+        for record in snapshot.records():
+            if subscriber.match(source, record.key):
+                rows.append(record.to_dict())
+    return rows
@@ -0,0 +1,167 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+
+class CircuitOpenError(Exception):
+    """Circuit breaker của host đang mở, request bị chặn ngay không gọi ra ngoài"""
+
+    def __init__(self, host, retry_after):
+        self.host = host
+        self.retry_after = retry_after
+        super().__init__(f"Circuit breaker đang mở cho host '{host}', thử lại sau {retry_after:.1f}s")
+
+
+class RateLimitError(Exception):
+    """Hết thời gian chờ token của rate limit phía mình (không phải lỗi của vendor)"""
+
+    def __init__(self, host):
+        self.host = host
+        super().__init__(f"Vượt rate limit của host '{host}'")
+
+
+class TokenBucket:
+    """Giới hạn tốc độ request theo thuật toán token bucket"""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)          # số token nạp lại mỗi giây
+        self.capacity = float(capacity)  # số request tối đa dồn được (burst)
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, max_wait):
+        """Lấy 1 token, chờ tối đa max_wait giây. Trả về False nếu hết thời gian chờ"""
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def penalize(self, seconds=0):
+        """Vendor trả 429/503: xả hết token (và nợ thêm `seconds` giây) để các request sau giãn ra"""
+        with self.lock:
+            self._refill()
+            self.tokens = -seconds * self.rate
+
+
+class CircuitBreaker:
+    """Circuit breaker 3 trạng thái: closed -> open -> half_open -> closed"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+
+    def retry_after(self):
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self):
+        """Cho phép request đi qua không. Khi half_open chỉ cho 1 request thử"""
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.retry_after() == 0:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def release(self):
+        """Trả lại lượt thử half_open khi request không thực sự được gửi tới vendor"""
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class HostPolicy:
+    """Gom rate limit + circuit breaker + cấu hình retry cho 1 host"""
+
+    def __init__(self, host, rate=1.0, burst=2, connect_timeout=5.0, read_timeout=15.0,
+                 max_retries=2, backoff_base=0.5, backoff_max=8.0,
+                 failure_threshold=3, reset_timeout=60.0, deadline=20.0):
+        self.host = host
+        self.deadline = deadline  # tổng thời gian tối đa cho 1 lần fetch_data
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+    def backoff(self, attempt):
+        """Exponential backoff kiểu "full jitter": random trong [0, base * 2^attempt]"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+
+def retry_after_seconds(value):
+    """Đọc header Retry-After (số giây hoặc HTTP-date), trả về số giây cần chờ"""
+    if not value:
+        return 0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return 0
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+# Các status nên thử lại: vendor quá tải hoặc lỗi tạm thời
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_policies = {}
+_policies_lock = threading.Lock()
+
+
+def get_policy(url):
+    """Lấy (hoặc tạo) HostPolicy dùng chung cho host của url"""
+    host = urlparse(url).netloc.lower() or url
+    with _policies_lock:
+        if host not in _policies:
+            _policies[host] = HostPolicy(host)
+        return _policies[host]
+
+
+def configure_host(host, **kwargs):
+    """Ghi đè cấu hình cho 1 host cụ thể, ví dụ configure_host("sjc.com.vn", rate=0.5)"""
+    with _policies_lock:
+        _policies[host.lower()] = HostPolicy(host.lower(), **kwargs)
+        return _policies[host.lower()]
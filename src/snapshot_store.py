@@ -0,0 +1,243 @@
+import re
+import sys
+import threading
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Giá trị đánh dấu ô giá bị thiếu (int64 không có NaN)
+MISSING = np.iinfo(np.int64).min
+
+# Các cột định danh sản phẩm / cột giá của từng nguồn (đã lowercase).
+# Thứ tự = độ ưu tiên, cột nào có trong DataFrame thì dùng.
+KEY_COLUMNS = ("typename", "branchname", "khu vực", "region", "loại vàng", "loai_vang",
+               "name", "n", "key", "k", "h", "currency")
+BUY_COLUMNS = ("buyvalue", "buy", "pb", "gia_mua", "giá mua", "giá mua vào", "xau_price")
+SELL_COLUMNS = ("sellvalue", "sell", "ps", "gia_ban", "giá bán", "giá bán ra")
+# Cột nhóm bị gộp ô (rowspan) như khu vực của PNJ: ô trống lấy giá trị của dòng trên
+GROUP_COLUMNS = ("khu vực", "region", "branchname")
+
+_THOUSANDS = re.compile(r"^-?\d{1,3}([.,]\d{3})+$")
+
+
+def _is_missing(value):
+    return value is None or (not isinstance(value, str) and pd.isna(value))
+
+
+def parse_price(value, scale=1):
+    """Chuyển giá dạng "78.500.000" / "2345.67" / số về int64 (nhân với scale)"""
+    if _is_missing(value):
+        return MISSING
+    if isinstance(value, str):
+        value = value.strip().replace(" ", "")
+        if not value:
+            return MISSING
+        if _THOUSANDS.match(value):
+            value = value.replace(".", "").replace(",", "")
+        else:
+            value = value.replace(",", "")
+        try:
+            value = float(value)
+        except ValueError:
+            return MISSING
+    return int(round(float(value) * scale))
+
+
+def build_keys(df, key_cols):
+    """Ghép các cột định danh thành key sản phẩm.
+
+    Ô trống thành "", cột nhóm được forward-fill; key trùng nhau được thêm hậu tố
+    " #2", " #3"... (bỏ qua hậu tố đã bị dùng) để không dòng nào bị ghi đè.
+    """
+    keys = []
+    last = {}
+    used = set()
+    for row in df[key_cols].itertuples(index=False, name=None):
+        parts = []
+        for col, value in zip(key_cols, row):
+            value = "" if _is_missing(value) else str(value).strip()
+            if col in GROUP_COLUMNS:
+                value = value or last.get(col, "")
+                last[col] = value
+            parts.append(value)
+
+        base = key = " | ".join(parts)
+        n = 1
+        while key in used:
+            n += 1
+            key = f"{base} #{n}"
+        used.add(key)
+        keys.append(key)
+    return keys
+
+
+def _pick(columns, candidates):
+    for col in candidates:
+        if col in columns:
+            return col
+    return None
+
+
+class PriceRecord:
+    """Một dòng giá trả về khi tra cứu (chỉ tạo khi cần)"""
+
+    __slots__ = ("source", "key", "buy", "sell", "crawl_ts")
+
+    def __init__(self, source, key, buy, sell, crawl_ts):
+        self.source = source
+        self.key = key
+        self.buy = buy
+        self.sell = sell
+        self.crawl_ts = crawl_ts
+
+    def to_dict(self):
+        return {
+            "source": self.source,
+            "key": self.key,
+            "buy": self.buy,
+            "sell": self.sell,
+            "crawl_time": datetime.fromtimestamp(self.crawl_ts).isoformat(),
+        }
+
+    def __repr__(self):
+        return f"PriceRecord({self.source!r}, {self.key!r}, buy={self.buy}, sell={self.sell})"
+
+
+class PriceSnapshot:
+    """Kết quả 1 lần crawl của 1 nguồn, lưu dạng struct-of-arrays.
+
+    - keys: tuple các key sản phẩm đã sys.intern (dùng chung giữa các snapshot)
+    - buy / sell: mảng int64, giá trị thiếu = MISSING
+    - crawl_ts: epoch (giây), source chỉ lưu 1 lần cho cả snapshot
+    """
+
+    __slots__ = ("source", "crawl_ts", "scale", "keys", "buy", "sell", "index")
+
+    def __init__(self, source, crawl_ts, keys, buy, sell, scale=1):
+        self.source = sys.intern(source)
+        self.crawl_ts = int(crawl_ts)
+        self.scale = scale
+        self.keys = tuple(sys.intern(k) for k in keys)
+        self.buy = np.asarray(buy, dtype=np.int64)
+        self.sell = np.asarray(sell, dtype=np.int64)
+        self.index = {k: i for i, k in enumerate(self.keys)}
+
+    @classmethod
+    def from_dataframe(cls, source, df, crawl_ts, key_cols=None, buy_col=None, sell_col=None):
+        """Tạo snapshot từ DataFrame của transform(); tự dò cột nếu không truyền vào"""
+        columns = [str(col).strip().lower() for col in df.columns]
+        df = df.set_axis(columns, axis=1)
+
+        key_cols = key_cols or [col for col in KEY_COLUMNS if col in columns]
+        buy_col = buy_col or _pick(columns, BUY_COLUMNS)
+        sell_col = sell_col or _pick(columns, SELL_COLUMNS)
+        if not key_cols or not (buy_col or sell_col):
+            raise ValueError(f"Không xác định được cột key/giá cho source '{source}': {columns}")
+
+        keys = build_keys(df, key_cols)
+
+        # Giá thế giới có phần thập phân -> lưu theo cent
+        raw = [df[col].tolist() if col else [None] * len(df) for col in (buy_col, sell_col)]
+        scale = 1
+        for value in raw[0] + raw[1]:
+            if isinstance(value, float) and not np.isnan(value) and not value.is_integer():
+                scale = 100
+                break
+            if isinstance(value, str) and not _THOUSANDS.match(value.strip()) and "." in value:
+                scale = 100
+                break
+
+        buy = [parse_price(v, scale) for v in raw[0]]
+        sell = [parse_price(v, scale) for v in raw[1]]
+        return cls(source, crawl_ts, keys, buy, sell, scale)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get(self, key):
+        """Tra cứu O(1) theo key sản phẩm, trả về PriceRecord hoặc None"""
+        i = self.index.get(key)
+        if i is None:
+            return None
+        return PriceRecord(self.source, key, self._value(self.buy[i]),
+                           self._value(self.sell[i]), self.crawl_ts)
+
+    def _value(self, v):
+        if v == MISSING:
+            return None
+        return int(v) if self.scale == 1 else int(v) / self.scale
+
+    def records(self):
+        return [self.get(k) for k in self.keys]
+
+    def diff(self, old):
+        """So sánh với snapshot cũ, trả về dict added / removed / changed (list key)"""
+        if old is None:
+            return {"added": list(self.keys), "removed": [], "changed": []}
+
+        if old.scale == self.scale and (old.keys is self.keys or old.keys == self.keys):
+            # Cùng danh sách sản phẩm (trường hợp phổ biến): so sánh vector hóa
+            mask = (old.buy != self.buy) | (old.sell != self.sell)
+            return {"added": [], "removed": [],
+                    "changed": [self.keys[i] for i in np.flatnonzero(mask)]}
+
+        changed = []
+        for key, i in self.index.items():
+            j = old.index.get(key)
+            if j is not None and (self._value(self.buy[i]) != old._value(old.buy[j]) or
+                                  self._value(self.sell[i]) != old._value(old.sell[j])):
+                changed.append(key)
+        return {
+            "added": [k for k in self.keys if k not in old.index],
+            "removed": [k for k in old.keys if k not in self.index],
+            "changed": changed,
+        }
+
+    def to_dataframe(self):
+        return pd.DataFrame([r.to_dict() for r in self.records()],
+                            columns=["source", "key", "buy", "sell", "crawl_time"])
+
+    def to_dict(self):
+        return [r.to_dict() for r in self.records()]
+
+
+class SnapshotStore:
+    """Giữ các snapshot trong RAM theo từng nguồn, tự bỏ snapshot quá retention"""
+
+    def __init__(self, retention_seconds=3 * 24 * 3600):
+        self.retention_seconds = retention_seconds
+        self.history = {}
+        self.lock = threading.Lock()
+
+    def add(self, snapshot):
+        """Thêm snapshot, trả về diff so với snapshot trước đó của cùng nguồn"""
+        with self.lock:
+            history = self.history.setdefault(snapshot.source, deque())
+            previous = history[-1] if history else None
+            if previous is not None and previous.keys == snapshot.keys:
+                # Dùng lại tuple keys của snapshot trước, không giữ 2 bản giống nhau
+                snapshot.keys = previous.keys
+                snapshot.index = previous.index
+            history.append(snapshot)
+
+            cutoff = snapshot.crawl_ts - self.retention_seconds
+            while len(history) > 1 and history[0].crawl_ts < cutoff:
+                history.popleft()
+
+        return snapshot.diff(previous)
+
+    def latest(self, source):
+        history = self.history.get(source)
+        return history[-1] if history else None
+
+    def get(self, source, key):
+        snapshot = self.latest(source)
+        return snapshot.get(key) if snapshot else None
+
+    def sources(self):
+        return list(self.history)
+
+    def snapshots(self, source):
+        return list(self.history.get(source, ()))
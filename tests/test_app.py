@@ -0,0 +1,47 @@
+import pandas as pd
+
+import app
+from src.gold_crawler import DOJIAPI
+from src.resilience import CircuitOpenError
+
+DOJI_XML = (
+    b'<root><DGPlist><DateTime>08:00 01/01/2025</DateTime>'
+    b'<Row Name="SJC - Ban Le" Key="dojihanoile" Sell="86,500" Buy="84,500"/>'
+    b'</DGPlist></root>'
+)
+
+
+class FakeResponse:
+    content = DOJI_XML
+
+
+def test_crawl_all_sources_serves_last_good_when_vendor_fails(monkeypatch):
+    monkeypatch.setattr(app, "apis", {"DOJI_DAILY": DOJIAPI})
+    monkeypatch.setattr(app, "last_good", {})
+    monkeypatch.setattr(app, "snapshot_store", app.SnapshotStore())
+
+    monkeypatch.setattr(DOJIAPI, "fetch_data", lambda self, payload=None: FakeResponse())
+    first = app.crawl_all_sources()["DOJI_DAILY"]
+    assert not first.attrs.get("stale")
+
+    def circuit_open(self, payload=None):
+        raise CircuitOpenError("doji.test", 42)
+
+    monkeypatch.setattr(DOJIAPI, "fetch_data", circuit_open)
+    second = app.crawl_all_sources()["DOJI_DAILY"]
+
+    assert second.attrs["stale"] is True
+    assert "Circuit breaker" in second.attrs["error"]
+    assert second["crawl_time"].tolist() == first["crawl_time"].tolist()
+    pd.testing.assert_frame_equal(second, first)
+
+
+def test_crawl_all_sources_without_last_good_returns_none(monkeypatch):
+    monkeypatch.setattr(app, "apis", {"DOJI_DAILY": DOJIAPI})
+    monkeypatch.setattr(app, "last_good", {})
+
+    def circuit_open(self, payload=None):
+        raise CircuitOpenError("doji.test", 42)
+
+    monkeypatch.setattr(DOJIAPI, "fetch_data", circuit_open)
+    assert app.crawl_all_sources()["DOJI_DAILY"] is None
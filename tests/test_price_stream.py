@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+import app
+from src.price_stream import PriceBroadcaster, Subscriber
+from src.snapshot_store import PriceSnapshot
+
+
+def test_subscriber_conflates_pending_rows():
+    async def scenario():
+        subscriber = Subscriber(sources=["doji"])
+        subscriber.push([{"source": "doji", "key": "a", "buy": 1},
+                         {"source": "sjc", "key": "a", "buy": 9}])
+        subscriber.push([{"source": "doji", "key": "a", "buy": 2}])
+        rows = await subscriber.next_batch(1)
+        assert rows == [{"source": "doji", "key": "a", "buy": 2}]
+        assert subscriber.dropped == 1
+        assert await subscriber.next_batch(0.01) == []
+
+    asyncio.run(scenario())
+
+
+def test_first_subscriber_sets_wakeup():
+    async def scenario():
+        broadcaster = PriceBroadcaster()
+        broadcaster.bind(asyncio.get_running_loop())
+        first = broadcaster.subscribe()
+        assert broadcaster.wakeup.is_set()
+        broadcaster.wakeup.clear()
+        broadcaster.subscribe()
+        assert not broadcaster.wakeup.is_set()
+        broadcaster.unsubscribe(first)
+
+    asyncio.run(scenario())
+
+
+def test_websocket_first_client_triggers_crawl(monkeypatch):
+    def fake_crawl():
+        df = pd.DataFrame({"name": ["SJC"], "buy": ["84,500"], "sell": ["86,500"]})
+        snapshot = PriceSnapshot.from_dataframe("doji_daily", df, time.time())
+        app.broadcaster.publish(snapshot, app.snapshot_store.add(snapshot))
+
+    monkeypatch.setattr(app, "crawl_all_sources", fake_crawl)
+    monkeypatch.setattr(app, "snapshot_store", app.SnapshotStore())
+
+    with TestClient(app.app) as client:
+        with client.websocket_connect("/prices/ws?sources=doji_daily") as websocket:
+            assert websocket.receive_json() == {"type": "snapshot", "rows": []}
+            message = websocket.receive_json()
+            assert message["type"] == "update"
+            assert message["rows"][0]["key"] == "SJC"
+            assert message["rows"][0]["type"] == "added"
+        deadline = time.monotonic() + 1
+        while app.broadcaster.has_subscribers() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert not app.broadcaster.has_subscribers()
+
+
+def test_websocket_key_filter_allows_commas(monkeypatch):
+    key = "Vàng SJC 1L, 10L, 1KG | Hồ Chí Minh"
+    store = app.SnapshotStore()
+    df = pd.DataFrame({"typename": ["Vàng SJC 1L, 10L, 1KG", "Vàng nhẫn SJC"],
+                       "branchname": ["Hồ Chí Minh", "Hồ Chí Minh"],
+                       "buyvalue": [84500000, 83000000], "sellvalue": [86500000, 84500000]})
+    store.add(PriceSnapshot.from_dataframe("sjc_daily", df, time.time()))
+    monkeypatch.setattr(app, "snapshot_store", store)
+    monkeypatch.setattr(app, "crawl_all_sources", lambda: None)
+
+    with TestClient(app.app) as client:
+        with client.websocket_connect("/prices/ws", params={"sources": "sjc_daily", "keys": key}) as websocket:
+            rows = websocket.receive_json()["rows"]
+    assert [row["key"] for row in rows] == [key]
@@ -0,0 +1,199 @@
+import time
+
+import pytest
+import requests
+
+from src import gold_crawler
+from src.gold_crawler import GoldPriceAPI
+from src.resilience import (CircuitBreaker, CircuitOpenError, RateLimitError, TokenBucket,
+                            configure_host, retry_after_seconds)
+
+
+class DummyAPI(GoldPriceAPI):
+    def transform(self, response):
+        return response
+
+
+class FakeResponse(requests.Response):
+    def __init__(self, status_code, headers=None, chunks=(b"{}",)):
+        super().__init__()
+        self.status_code = status_code
+        self.headers.update(headers or {})
+        self.chunks = chunks
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        yield from self.chunks
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(gold_crawler.time, "sleep", lambda seconds: None)
+
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_breaker_half_open_allows_single_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+
+
+def test_breaker_half_open_success_closes():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+
+
+def test_breaker_half_open_failure_reopens():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.01)
+    for _ in range(3):
+        breaker.record_failure()
+    time.sleep(0.02)
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.retry_after() > 0
+
+
+def test_breaker_release_returns_probe_slot():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow()
+
+
+def test_token_bucket_burst_and_refill():
+    bucket = TokenBucket(rate=100, capacity=2)
+    assert bucket.acquire(0)
+    assert bucket.acquire(0)
+    assert not bucket.acquire(0)
+    assert bucket.acquire(0.1)
+
+
+def test_token_bucket_penalize_drains_tokens():
+    bucket = TokenBucket(rate=1, capacity=5)
+    bucket.penalize()
+    assert not bucket.acquire(0)
+
+
+def test_fetch_data_retries_then_succeeds(monkeypatch, no_sleep):
+    configure_host("retry.test", rate=1000, burst=10)
+    responses = iter([FakeResponse(503), FakeResponse(200)])
+    monkeypatch.setattr(gold_crawler.requests, "get", lambda *a, **kw: next(responses))
+
+    response = DummyAPI("http://retry.test/prices").fetch_data()
+    assert response.status_code == 200
+
+
+def test_fetch_data_unexpected_error_does_not_stick_half_open(monkeypatch, no_sleep):
+    policy = configure_host("chunked.test", rate=1000, burst=10, max_retries=0,
+                            failure_threshold=1, reset_timeout=60)
+    policy.breaker.record_failure()
+    policy.breaker.opened_at -= 60
+
+    def broken(*args, **kwargs):
+        raise requests.exceptions.ChunkedEncodingError("broken")
+
+    monkeypatch.setattr(gold_crawler.requests, "get", broken)
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        DummyAPI("http://chunked.test/prices").fetch_data()
+    assert policy.breaker.state == CircuitBreaker.OPEN
+
+    policy.breaker.opened_at -= 60
+    monkeypatch.setattr(gold_crawler.requests, "get", lambda *a, **kw: FakeResponse(200))
+    assert DummyAPI("http://chunked.test/prices").fetch_data().status_code == 200
+    assert policy.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_fetch_data_local_rate_limit_does_not_open_breaker(monkeypatch, no_sleep):
+    policy = configure_host("busy.test", rate=0.001, burst=1, backoff_max=0,
+                            failure_threshold=1)
+    monkeypatch.setattr(gold_crawler.requests, "get", lambda *a, **kw: FakeResponse(200))
+    api = DummyAPI("http://busy.test/prices")
+
+    assert api.fetch_data().status_code == 200
+    for _ in range(3):
+        with pytest.raises(RateLimitError):
+            api.fetch_data()
+    assert policy.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_fetch_data_open_circuit_fails_fast(monkeypatch, no_sleep):
+    policy = configure_host("down.test", rate=1000, burst=10, max_retries=0,
+                            failure_threshold=1, reset_timeout=60)
+    monkeypatch.setattr(gold_crawler.requests, "get", lambda *a, **kw: FakeResponse(500))
+    api = DummyAPI("http://down.test/prices")
+
+    with pytest.raises(Exception, match="500"):
+        api.fetch_data()
+    with pytest.raises(CircuitOpenError):
+        api.fetch_data()
+    assert policy.breaker.state == CircuitBreaker.OPEN
+
+
+def test_retry_after_seconds():
+    assert retry_after_seconds("7") == 7
+    assert retry_after_seconds(None) == 0
+    assert retry_after_seconds("not a date") == 0
+    assert retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+
+
+def test_fetch_data_reads_body_within_deadline(monkeypatch, no_sleep):
+    configure_host("body.test", rate=1000, burst=10)
+    monkeypatch.setattr(gold_crawler.requests, "get",
+                        lambda *a, **kw: FakeResponse(200, chunks=(b'{"a": ', b"1}")))
+    assert DummyAPI("http://body.test/prices").fetch_data().json() == {"a": 1}
+
+
+def test_fetch_data_retry_after_beyond_deadline_stops_retrying(monkeypatch, no_sleep):
+    policy = configure_host("throttled.test", rate=1000, burst=10, max_retries=5, deadline=20)
+    calls = []
+
+    def throttled(*args, **kwargs):
+        calls.append(kwargs["timeout"])
+        return FakeResponse(429, headers={"Retry-After": "120"})
+
+    monkeypatch.setattr(gold_crawler.requests, "get", throttled)
+    with pytest.raises(Exception, match="429"):
+        DummyAPI("http://throttled.test/prices").fetch_data()
+    assert len(calls) == 1
+    assert all(t <= 20 for t in calls[0])
+    assert not policy.bucket.acquire(0)
+
+
+def test_fetch_data_trickling_body_hits_deadline(monkeypatch):
+    policy = configure_host("slow.test", rate=1000, burst=10, max_retries=0, deadline=0.05)
+
+    def trickle():
+        for _ in range(10):
+            time.sleep(0.02)
+            yield b"x"
+
+    monkeypatch.setattr(gold_crawler.requests, "get",
+                        lambda *a, **kw: FakeResponse(200, chunks=trickle()))
+    started = time.monotonic()
+    with pytest.raises(requests.Timeout):
+        DummyAPI("http://slow.test/prices").fetch_data()
+    assert time.monotonic() - started < 0.15
+    assert policy.breaker.failures == 1
@@ -0,0 +1,148 @@
+import pandas as pd
+
+from src.snapshot_store import MISSING, PriceSnapshot, SnapshotStore, build_keys, parse_price
+
+
+def with_metadata(df, source):
+    """Giống crawl_all_sources: lowercase cột + thêm source / crawl_time"""
+    df.columns = [col.lower() for col in df.columns]
+    df["source"] = source
+    df["crawl_time"] = "2025-01-01T08:00:00"
+    return df
+
+
+def test_parse_price_formats():
+    assert parse_price("78.500.000") == 78500000
+    assert parse_price("78,500") == 78500
+    assert parse_price("2,345.67", scale=100) == 234567
+    assert parse_price(2345.67, scale=100) == 234567
+    assert parse_price("") == MISSING
+    assert parse_price(None) == MISSING
+    assert parse_price(float("nan")) == MISSING
+    assert parse_price("Liên hệ") == MISSING
+
+
+def test_from_dataframe_btmc():
+    df = with_metadata(pd.DataFrame([
+        {"row": "1", "n": "VÀNG MIẾNG VRTL", "k": "24k", "h": "999.9", "pb": "8350", "ps": "8480",
+         "pt": "0", "d": "01/01/2025 08:00"},
+        {"row": "2", "n": "NHẪN TRÒN TRƠN", "k": "24k", "h": "999.9", "pb": "8340", "ps": "8470",
+         "pt": "0", "d": "01/01/2025 08:00"},
+    ]), "btmc_daily")
+
+    snapshot = PriceSnapshot.from_dataframe("btmc_daily", df, 0)
+    record = snapshot.get("VÀNG MIẾNG VRTL | 24k | 999.9")
+    assert (record.buy, record.sell) == (8350, 8480)
+    assert len(snapshot) == 2
+
+
+def test_from_dataframe_sjc():
+    df = with_metadata(pd.DataFrame([
+        {"Id": 1, "TypeName": "Vàng SJC 1L", "BranchName": "Hồ Chí Minh", "Buy": "84,500",
+         "BuyValue": 84500000.0, "Sell": "86,500", "SellValue": 86500000.0},
+        {"Id": 2, "TypeName": "Vàng SJC 1L", "BranchName": "Hà Nội", "Buy": "84,500",
+         "BuyValue": 84500000.0, "Sell": "86,520", "SellValue": 86520000.0},
+    ]), "sjc_daily")
+
+    snapshot = PriceSnapshot.from_dataframe("sjc_daily", df, 0)
+    assert snapshot.scale == 1
+    assert snapshot.get("Vàng SJC 1L | Hà Nội").sell == 86520000
+
+
+def test_from_dataframe_pnj_fills_rowspan_region():
+    # PNJAPI.transform chèn None vào cột khu vực cho các dòng gộp ô
+    df = with_metadata(pd.DataFrame([
+        ["TPHCM", "PNJ", "84.000", "85.200"],
+        [None, "SJC", "84.500", "86.500"],
+        ["Hà Nội", "PNJ", "84.000", "85.200"],
+        [None, "SJC", "84.600", "86.600"],
+    ], columns=["khu vực", "loại vàng", "giá mua", "giá bán"]), "pnj_daily")
+
+    snapshot = PriceSnapshot.from_dataframe("pnj_daily", df, 0)
+    assert snapshot.keys == ("TPHCM | PNJ", "TPHCM | SJC", "Hà Nội | PNJ", "Hà Nội | SJC")
+    assert snapshot.get("TPHCM | SJC").buy == 84500
+    assert snapshot.get("Hà Nội | SJC").buy == 84600
+
+
+def test_from_dataframe_doji():
+    df = with_metadata(pd.DataFrame([
+        {"Name": "SJC - Bán Lẻ", "Key": "dojihanoile", "Sell": "86,500", "Buy": "84,500", "Time": "08:00"},
+        {"Name": "AVPL", "Key": "dojihanoiavpl", "Sell": "86,500", "Buy": "", "Time": "08:00"},
+    ]), "doji_daily")
+
+    snapshot = PriceSnapshot.from_dataframe("doji_daily", df, 0)
+    record = snapshot.get("AVPL | dojihanoiavpl")
+    assert (record.buy, record.sell) == (None, 86500)
+
+
+def test_from_dataframe_phu_quy():
+    df = with_metadata(pd.DataFrame([
+        ["Vàng miếng SJC", "Vnđ/Chỉ", "8,450,000", "8,650,000"],
+        ["Nhẫn tròn Phú Quý 999.9", "Vnđ/Chỉ", "8,400,000", "8,550,000"],
+    ], columns=["Loại vàng", "Đơn vị", "Giá mua vào", "Giá bán ra"]), "phu_quy_daily")
+
+    snapshot = PriceSnapshot.from_dataframe("phu_quy_daily", df, 0)
+    assert snapshot.scale == 1
+    assert snapshot.get("Vàng miếng SJC").sell == 8650000
+
+
+def test_from_dataframe_pnj_history():
+    df = pd.DataFrame({
+        "loai_vang": ["SJC", "PNJ"],
+        "gia_mua": [84500000, 84000000],
+        "gia_ban": [86500000, 85200000],
+        "thoi_gian_cap_nhat": pd.to_datetime(["2025-01-01 08:00:00"] * 2),
+        "region": ["TPHCM", "TPHCM"],
+    })
+
+    snapshot = PriceSnapshot.from_dataframe("pnj_history", df, 0)
+    assert snapshot.get("TPHCM | SJC").buy == 84500000
+
+
+def test_from_dataframe_world_gold_uses_cents():
+    df = with_metadata(pd.DataFrame([{"timestamp": 1, "currency": "USD", "xau_price": 2645.37,
+                                      "xag_price": 30.1}]), "world_gold_price")
+
+    snapshot = PriceSnapshot.from_dataframe("world_gold_price", df, 0)
+    assert snapshot.scale == 100
+    assert snapshot.buy[0] == 264537
+    assert snapshot.get("USD").buy == 2645.37
+
+
+def test_build_keys_disambiguates_duplicates():
+    df = pd.DataFrame({"name": ["SJC", "SJC", "", None]})
+    assert build_keys(df, ["name"]) == ["SJC", "SJC #2", "", " #2"]
+
+    df = pd.DataFrame({"name": ["SJC", "SJC", "SJC #2"], "buy": [1, 2, 3], "sell": [4, 5, 6]})
+    assert build_keys(df, ["name"]) == ["SJC", "SJC #2", "SJC #2 #2"]
+
+    snapshot = PriceSnapshot.from_dataframe("s", df, 0)
+    assert len(snapshot.index) == len(snapshot) == 3
+    assert [snapshot.get(k).buy for k in snapshot.keys] == [1, 2, 3]
+
+
+def test_diff_same_keys_fast_path():
+    old = PriceSnapshot("s", 0, ["a", "b"], [1, 2], [3, 4])
+    new = PriceSnapshot("s", 1, ["a", "b"], [1, 5], [3, 4])
+    assert new.diff(old) == {"added": [], "removed": [], "changed": ["b"]}
+    assert new.diff(None) == {"added": ["a", "b"], "removed": [], "changed": []}
+
+
+def test_diff_different_keys_and_scale():
+    old = PriceSnapshot("s", 0, ["a", "b"], [100, 2], [3, 4])
+    new = PriceSnapshot("s", 1, ["a", "c"], [10000, 7], [300, 8], scale=100)
+    assert new.diff(old) == {"added": ["c"], "removed": ["b"], "changed": []}
+
+
+def test_store_reuses_keys_and_prunes_old_snapshots():
+    store = SnapshotStore(retention_seconds=100)
+    first = PriceSnapshot("s", 0, ["a"], [1], [2])
+    second = PriceSnapshot("s", 50, ["a"], [1], [3])
+    store.add(first)
+    assert store.add(second)["changed"] == ["a"]
+    assert second.keys is first.keys
+
+    store.add(PriceSnapshot("s", 200, ["a"], [1], [3]))
+    assert [snap.crawl_ts for snap in store.snapshots("s")] == [200]
+    assert store.get("s", "a").sell == 3
+    assert store.latest("missing") is None